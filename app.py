@@ -16,55 +16,353 @@ Nouveautés globales
 """
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date
 from pathlib import Path
+import codecs
 import csv
+import functools
 import io
+import re
+import numpy as np
 import pandas as pd
+from charset_normalizer import from_bytes
 import streamlit as st
 
+try:  # lecteur Excel en Rust (pandas ≥ 2.2), gère .xlsx et .xls
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE: str | None = "calamine"
+except ImportError:
+    EXCEL_ENGINE = None
+
+try:  # lecteur CSV multithread (C++), repli sur le moteur C de pandas
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pc = pacsv = None
+
 # ─────────────────────────────  CONFIG  ─────────────────────────────
 st.set_page_config(page_title="Générateur DFRX / AFRX", page_icon="🛠️", layout="wide")
 
+ACK_CMP_TMPL = "DFRXHYBRCMP{d}000068240530ITDFRXHYBRCMP{d}CCMGHYBFRX                    OK000000"
+ACK_PCP_TMPL = "DFRXHYBRPCP{d}000068200117ITDFRXHYBRPCP{d}RCMRHYBFRX                    OK000000"
+MAX_INVALID_SHOWN = 50  # lignes invalides affichées au maximum
+STR_DTYPE = "string[pyarrow]" if pa is not None else "string"  # chaînes Arrow si dispo
+CODE_RE   = re.compile(r"\d{5,6}")
+
 # ───────────────────────────  OUTILS I/O  ───────────────────────────
 
-def today_yyMMdd() -> str:
-    return datetime.today().strftime("%y%m%d")
+@functools.lru_cache(maxsize=2)
+def _yyMMdd_for(ordinal: int) -> str:
+    return date.fromordinal(ordinal).strftime("%y%m%d")
 
 
-def read_csv(buf: io.BytesIO) -> pd.DataFrame:
-    for enc in ("utf-8", "latin1", "cp1252"):
+def today_yyMMdd() -> str:
+    """Date du jour (AAMMJJ), formatée une seule fois par jour."""
+    return _yyMMdd_for(date.today().toordinal())
+
+
+def detect_encoding(head: bytes) -> str:
+    # BOM, puis essai UTF-8 (fin d'échantillon tronquée tolérée), puis charset_normalizer.
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    best = from_bytes(head).best()
+    return best.encoding if best and best.encoding else "cp1252"
+
+
+def _sniff_csv(head: bytes) -> tuple[str, str, int]:
+    """Encodage, séparateur et nombre de colonnes de l'en-tête."""
+    enc    = detect_encoding(head)
+    header = head.decode(enc, errors="ignore").partition("\n")[0]
+    sep = max(";,|\t", key=header.count)
+    return enc, sep, header.count(sep) + 1
+
+
+def _parse_csv(buf: io.BytesIO, enc: str, sep: str, ncols: int, cols: list[int]) -> pd.DataFrame:
+    """Arrow si possible, sinon moteur C ; UnicodeDecodeError si `enc` ne convient pas."""
+    if pacsv is not None:
         buf.seek(0)
+        # Noms positionnels : seules les colonnes utiles sont converties, en chaînes.
+        names = [f"c{i}" for i in range(ncols)]
+        keep  = [names[c] for c in cols]
+        try:
+            table = pacsv.read_csv(
+                buf,
+                read_options=pacsv.ReadOptions(encoding=enc, column_names=names, skip_rows=1),
+                parse_options=pacsv.ParseOptions(delimiter=sep),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=keep,
+                    column_types={n: pa.string() for n in keep},
+                    strings_can_be_null=True,
+                ),
+            )
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        except (pa.ArrowInvalid, UnicodeDecodeError):
+            pass  # fichier mal formé ou UTF-8 invalide : le moteur C tranche
+    buf.seek(0)
+    # index_col=False : des « ; » finaux sans en-tête ne doivent pas décaler les colonnes en index.
+    return pd.read_csv(buf, sep=sep, encoding=enc, engine="c", usecols=cols, dtype=str, index_col=False, on_bad_lines="skip")
+
+
+def read_csv(buf: io.BytesIO, cols: list[int]) -> pd.DataFrame:
+    # Détection sur les 64 premiers Kio seulement, puis lecture directe du buffer.
+    buf.seek(0)
+    enc, sep, ncols = _sniff_csv(buf.read(65536))
+    if max(cols) >= ncols:
+        raise IndexError(f"colonne {max(cols) + 1} absente ({ncols} colonnes)")
+    # L'échantillon peut tromper (accent après 64 Kio) : nouvel essai en cp1252 puis latin1.
+    for encoding in dict.fromkeys((enc, "cp1252", "latin1")):
         try:
-            sample = buf.read(2048).decode(enc, errors="ignore")
-            sep = csv.Sniffer().sniff(sample, delimiters=";,|\t").delimiter
-            buf.seek(0)
-            return pd.read_csv(buf, sep=sep, encoding=enc, engine="python", on_bad_lines="skip")
-        except (UnicodeDecodeError, csv.Error, pd.errors.ParserError):
+            return _parse_csv(buf, encoding, sep, ncols, cols)
+        except UnicodeDecodeError:
             continue
+        except pd.errors.ParserError as e:
+            raise ValueError("CSV illisible (encodage ou séparateur)") from e
     raise ValueError("CSV illisible (encodage ou séparateur)")
 
 
-def read_any(file) -> pd.DataFrame:
-    suffix = Path(file.name.lower()).suffix
+def _read_xlsx_openpyxl(data: bytes, cols: list[int]) -> pd.DataFrame:
+    # Repli sans calamine : lecture en flux (read_only), cellules des seules colonnes utiles.
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()  # <dimension> parfois faux (ex. « A1 ») : comme pandas, on l'ignore
+        lo   = min(cols)
+        rows = ws.iter_rows(min_col=lo + 1, values_only=True)
+        width = len(next(rows, ()))  # ligne d'en-tête, comme pd.read_excel
+        data_rows = []
+        for row in rows:
+            width = max(width, len(row))
+            data_rows.append([row[c - lo] if c - lo < len(row) else None for c in cols])
+    finally:
+        wb.close()
+    # Largeur réelle = ligne la plus large effectivement lue.
+    if max(cols) >= lo + width:
+        raise IndexError(f"colonne {max(cols) + 1} absente ({lo + width} colonnes)")
+    return pd.DataFrame(data_rows, columns=cols, dtype=object)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _parse_bytes(file_id: str, _data: bytes, suffix: str, usecols: tuple[int, ...]) -> pd.DataFrame:
+    """Seules les colonnes `usecols` (1=A, dans cet ordre) sont lues ; IndexError si hors plage.
+
+    Cache indexé sur l'identifiant d'upload : `_data` n'est pas re-hashé à chaque rerun.
+    """
+    cols = sorted({c - 1 for c in usecols})
     if suffix == ".csv":
-        return read_csv(io.BytesIO(file.getvalue()))
-    if suffix in {".xlsx", ".xls"}:
-        file.seek(0)
-        engine = "openpyxl" if suffix == ".xlsx" else "xlrd"
-        return pd.read_excel(file, engine=engine)
-    raise ValueError(f"Extension non gérée : {suffix}")
-
-
-def sanitize_code(code: str) -> str | None:
-    s = str(code).strip()
-    if not s.isdigit():
-        return None
-    if len(s) == 5:
-        s = s.zfill(6)
-    if len(s) != 6:
-        return None
-    return s
+        df = read_csv(io.BytesIO(_data), cols)
+    elif suffix == ".xlsx" and EXCEL_ENGINE is None:
+        df = _read_xlsx_openpyxl(_data, cols)
+    elif suffix in {".xlsx", ".xls"}:
+        try:
+            df = pd.read_excel(io.BytesIO(_data), engine=EXCEL_ENGINE or "xlrd", usecols=cols, dtype=str)
+        except pd.errors.ParserError as e:  # usecols hors des bornes de la feuille
+            raise IndexError(str(e)) from e
+    else:
+        raise ValueError(f"Extension non gérée : {suffix}")
+    if df.shape[1] < len(cols):
+        raise IndexError(f"colonne {max(cols) + 1} absente")
+    return df.iloc[:, [cols.index(c - 1) for c in usecols]]
+
+
+def sanitize_codes_vec(s: pd.Series) -> pd.Series:
+    """Codes M2 sur 6 chiffres (5 chiffres → zéro en tête), <NA> si invalide.
+
+    `s` : chaînes déjà nettoyées (cf. `read_column`).
+    """
+    if pc is not None:
+        # Sans moteur regex : chiffres uniquement et longueur 5 ou 6.
+        arr    = pa.array(s)
+        length = pc.utf8_length(arr)
+        valid  = pc.and_(pc.utf8_is_decimal(arr), pc.and_(pc.greater_equal(length, 5), pc.less_equal(length, 6)))
+        mask   = np.asarray(valid.fill_null(False))
+    else:
+        mask = s.str.fullmatch(CODE_RE, na=False)
+    s = s.where(mask)
+    return s.str.zfill(6)
+
+
+def read_column(file, col_idx: int) -> pd.Series:
+    """Valeurs non vides de la colonne, en chaînes sans espaces de bord."""
+    col = _parse_bytes(file.file_id, file.getvalue(), Path(file.name.lower()).suffix, (col_idx,)).iloc[:, 0]
+    # Un seul filtre final (NA et chaînes vides) au lieu de dropna puis != "".
+    col = col.astype(STR_DTYPE).str.strip()
+    return col[col.ne("").fillna(False)]
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_mapping(file_id: str, _data: bytes, suffix: str, col_old: int, col_new: int) -> dict[str, str]:
+    """Table M2_ancien → M2_nouveau (IndexError si colonne hors plage).
+
+    Dict partagé entre reruns (cache_resource, pas de copie) : lecture seule.
+    """
+    df_map    = _parse_bytes(file_id, _data, suffix, (col_old, col_new))
+    old_codes = sanitize_codes_vec(df_map.iloc[:, 0].astype(STR_DTYPE).str.strip())
+    new_codes = sanitize_codes_vec(df_map.iloc[:, 1].astype(STR_DTYPE).str.strip())
+    map_df = pd.DataFrame({"old": old_codes, "new": new_codes}).dropna().drop_duplicates("old")
+    return dict(zip(map_df["old"].to_numpy(), map_df["new"].to_numpy()))
+
+
+# ────────────────────────  FICHIERS DE SORTIE  ────────────────────────
+
+def unique_tuple(s: pd.Series) -> tuple[str, ...]:
+    # Dédoublonnage en une passe, ordre d'apparition conservé ; tuple = clé de cache.
+    return tuple(dict.fromkeys(s.tolist()))
+
+
+def join_accounts(comptes: pd.Series) -> str:
+    # Comptes distincts joints par « , » sans repasser par des objets str Python (Arrow).
+    if pc is not None:
+        # string[pyarrow] est large_string (pandas ≥ 2.2) : binary_join n'a pas de noyau list<large_string>.
+        arr = pc.unique(pa.array(comptes).cast(pa.string()))
+        lst = pa.ListArray.from_arrays(pa.array([0, len(arr)], pa.int32()), arr)
+        return pc.binary_join(lst, ",")[0].as_py()
+    return ",".join(unique_tuple(comptes))
+
+
+@functools.lru_cache(maxsize=1)
+def ack_payloads(dstr: str) -> tuple[bytes, bytes]:
+    # ACK CMP / ACK PCP : ne dépendent que de la date, calculés une fois par jour.
+    return ACK_CMP_TMPL.format(d=dstr).encode(), ACK_PCP_TMPL.format(d=dstr).encode()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def pcp_payload(codes: tuple[str, ...], entreprise: str, statut: str) -> bytes:
+    """Fichier DFRXHYBRPCP (codes déjà dédoublonnés)."""
+    # Seul le code varie : préfixe/suffixe de ligne calculés une fois (quoting csv),
+    # puis un unique join sur les codes.
+    buf = io.StringIO()
+    csv.writer(buf, delimiter=";", lineterminator="").writerow((f"PC_PROFILE_{entreprise}", statut, ""))
+    head = buf.getvalue() + ";M2_"
+    tail = ";frxProductCatallog:Online\n"
+    return (head + (tail + head).join(codes) + tail if codes else "").encode("utf-8")
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def cmp_payload(comptes: str, entreprise: str) -> bytes:
+    """Fichier DFRXHYBRCMP (comptes déjà joints)."""
+    return f"PC_{entreprise};PC_{entreprise};PC_PROFILE_{entreprise};{comptes};frxProductCatalog:Online".encode("utf-8")
+
+
+def render_downloads(codes: tuple[str, ...], comptes: str, entreprise: str, statut: str, dstr: str) -> None:
+    # Chaque contenu a son propre cache : changer le statut ne reconstruit pas le CMP, etc.
+    ack_cmp, ack_pcp = ack_payloads(dstr)
+    st.download_button(f"📥 DFRXHYBRPCP{dstr}0000", pcp_payload(codes, entreprise, statut), file_name=f"DFRXHYBRPCP{dstr}0000", mime="text/plain")
+    st.download_button("📥 ACK CMP", ack_cmp, file_name=f"AFRXHYBRCMP{dstr}0000", mime="text/plain")
+    st.download_button(f"📥 DFRXHYBRCMP{dstr}0000", cmp_payload(comptes, entreprise), file_name=f"DFRXHYBRCMP{dstr}0000", mime="text/plain")
+    st.download_button("📥 ACK PCP", ack_pcp, file_name=f"AFRXHYBRPCP{dstr}0000", mime="text/plain")
+
+# ─────────────────────────────  GÉNÉRATION  ─────────────────────────────
+def _last_result(slot: str, key: tuple):
+    """Dernier résultat mémorisé en session pour `slot`, si `key` n'a pas changé."""
+    hit = st.session_state.get(slot)
+    return hit[1] if hit is not None and hit[0] == key else None
+
+
+@st.fragment
+def _generate_pc(codes_file, compte_file, col_idx_codes, col_idx_comptes, entreprise, statut) -> None:
+    """Bouton Générer (page 1) : seul ce fragment est ré-exécuté au clic."""
+    if st.button("🚀 Générer"):
+        if not all([codes_file, compte_file, entreprise, statut, col_idx_codes, col_idx_comptes]):
+            st.warning("Remplir tous les champs et joindre les 2 fichiers.")
+            return
+
+        key = (codes_file.file_id, compte_file.file_id, col_idx_codes, col_idx_comptes)
+        result = _last_result("_gen_pc", key)
+        if result is None:  # re-clic à l'identique : ni lecture ni recalcul
+            try:
+                raw_codes = read_column(codes_file, col_idx_codes)
+                comptes   = read_column(compte_file, col_idx_comptes)
+            except IndexError:
+                st.error("Indice colonne hors plage.")
+                return
+            except Exception as e:
+                st.error(f"Erreur lecture : {e}")
+                return
+
+            sanitized = sanitize_codes_vec(raw_codes)
+            invalid = sanitized.isna()
+            if invalid.any():
+                st.error(f"Codes M2 invalides détectés : {invalid.sum()} (aperçu limité à {MAX_INVALID_SHOWN} lignes).")
+                st.dataframe(raw_codes[invalid].head(MAX_INVALID_SHOWN).to_frame("Code fourni"))
+                return
+
+            result = (unique_tuple(sanitized), join_accounts(comptes))
+            st.session_state["_gen_pc"] = (key, result)
+
+        render_downloads(*result, entreprise, statut, today_yyMMdd())
+
+
+@st.fragment
+def _generate_maj(codes_file, compte_file, map_file, col_idx_codes, col_idx_comptes, col_idx_old, col_idx_new, entreprise, statut) -> None:
+    """Bouton Générer MàJ (page 2) : seul ce fragment est ré-exécuté au clic."""
+    if st.button("🚀 Générer MàJ"):
+        required = [codes_file, compte_file, map_file, entreprise, statut, col_idx_codes, col_idx_comptes, col_idx_old, col_idx_new]
+        if not all(required):
+            st.warning("Veuillez remplir tous les champs et joindre les trois fichiers.")
+            return
+
+        key = (codes_file.file_id, compte_file.file_id, map_file.file_id, col_idx_codes, col_idx_comptes, col_idx_old, col_idx_new)
+        result = _last_result("_gen_maj", key)
+        if result is None:  # re-clic à l'identique : ni lecture ni recalcul
+            # ----- extraction codes & comptes -----
+            try:
+                raw_codes = read_column(codes_file, col_idx_codes)
+                comptes   = read_column(compte_file, col_idx_comptes)
+            except IndexError:
+                st.error("Indice colonne hors plage.")
+                return
+            except Exception as e:
+                st.error(f"Erreur lecture : {e}")
+                return
+
+            sanitized = sanitize_codes_vec(raw_codes)
+            invalid = sanitized.isna()
+            if invalid.any():
+                st.error(f"Codes M2 invalides détectés : {invalid.sum()} (aperçu limité à {MAX_INVALID_SHOWN} lignes).")
+                st.dataframe(raw_codes[invalid].head(MAX_INVALID_SHOWN).to_frame("Code fourni"))
+                return
+
+            # ----- mapping -----
+            try:
+                mapping = load_mapping(map_file.file_id, map_file.getvalue(), Path(map_file.name.lower()).suffix, col_idx_old, col_idx_new)
+            except IndexError:
+                st.error("Indice colonne mapping hors plage.")
+                return
+            except Exception as e:
+                st.error(f"Erreur lecture : {e}")
+                return
+
+            mapped        = sanitized.map(mapping)
+            not_found     = mapped.isna()
+            updated_codes = mapped.where(~not_found, sanitized)
+            changed_mask  = updated_codes.ne(sanitized)
+
+            details = None
+            if changed_mask.any():
+                details = pd.DataFrame({"Ancien": sanitized[changed_mask].values, "Nouveau": updated_codes[changed_mask].values})
+            result = (unique_tuple(updated_codes), join_accounts(comptes), int(changed_mask.sum()), int(not_found.sum()), details)
+            st.session_state["_gen_maj"] = (key, result)
+
+        codes, comptes, n_changed, n_not_found, details = result
+        st.success("Mise à jour terminée :")
+        st.write(f"• {n_changed} code(s) remplacé(s)")
+        st.write(f"• {n_not_found} code(s) sans correspondance → conservés")
+
+        if details is not None:
+            st.expander("Voir détails").dataframe(details)
+
+        # ----- génération fichiers -----
+        render_downloads(codes, comptes, entreprise, statut, today_yyMMdd())
 
 # ─────────────────────────────  NAVIGATION  ─────────────────────────────
 page = st.sidebar.radio("Navigation", ["Générateur PC", "Mise à jour M2"])
@@ -83,57 +381,7 @@ if page == "Générateur PC":
     entreprise = st.text_input("🏢 Entreprise")
     statut     = st.selectbox("📌 Statut", ["", "INCLUDE", "EXCLUDE"])
 
-    if st.button("🚀 Générer"):
-        if not all([codes_file, compte_file, entreprise, statut, col_idx_codes, col_idx_comptes]):
-            st.warning("Remplir tous les champs et joindre les 2 fichiers.")
-            st.stop()
-
-        try:
-            df_codes   = read_any(codes_file)
-            df_comptes = read_any(compte_file)
-        except Exception as e:
-            st.error(f"Erreur lecture : {e}")
-            st.stop()
-
-        try:
-            raw_codes = df_codes.iloc[:, col_idx_codes-1].dropna().astype(str).str.strip()
-            comptes   = df_comptes.iloc[:, col_idx_comptes-1].dropna().astype(str).str.strip()
-        except IndexError:
-            st.error("Indice colonne hors plage.")
-            st.stop()
-
-        sanitized = raw_codes.apply(sanitize_code)
-        if sanitized.isna().any():
-            st.error("Codes M2 invalides détectés.")
-            st.dataframe(raw_codes[sanitized.isna()].to_frame("Code fourni"))
-            st.stop()
-
-        codes = sanitized
-        dstr  = today_yyMMdd()
-
-        df1 = pd.DataFrame({
-            0: [f"PC_PROFILE_{entreprise}"] * len(codes),
-            1: [statut] * len(codes),
-            2: [None] * len(codes),
-            3: [f"M2_{c}" for c in codes],
-            4: ["frxProductCatallog:Online"] * len(codes),
-        }).drop_duplicates()
-
-        st.download_button(
-            f"📥 DFRXHYBRPCP{dstr}0000",
-            df1.to_csv(sep=";", index=False, header=False),
-            file_name=f"DFRXHYBRPCP{dstr}0000",
-            mime="text/plain",
-        )
-
-        ack_cmp = f"DFRXHYBRCMP{dstr}000068240530ITDFRXHYBRCMP{dstr}CCMGHYBFRX                    OK000000"
-        st.download_button("📥 ACK CMP", ack_cmp, file_name=f"AFRXHYBRCMP{dstr}0000", mime="text/plain")
-
-        cmp_content = f"PC_{entreprise};PC_{entreprise};PC_PROFILE_{entreprise};{','.join(comptes)};frxProductCatalog:Online"
-        st.download_button("📥 DFRXHYBRCMP{dstr}0000", cmp_content, file_name=f"DFRXHYBRCMP{dstr}0000", mime="text/plain")
-
-        ack_pcp = f"DFRXHYBRPCP{dstr}000068200117ITDFRXHYBRPCP{dstr}RCMRHYBFRX                    OK000000"
-        st.download_button("📥 ACK PCP", ack_pcp, file_name=f"AFRXHYBRPCP{dstr}0000", mime="text/plain")
+    _generate_pc(codes_file, compte_file, col_idx_codes, col_idx_comptes, entreprise, statut)
 
 # ═══════════════════════════  PAGE 2 – MISE À JOUR  ═══════════════════════
 if page == "Mise à jour M2":
@@ -156,73 +404,4 @@ if page == "Mise à jour M2":
     entreprise = st.text_input("🏢 Entreprise")
     statut     = st.selectbox("📌 Statut", ["", "INCLUDE", "EXCLUDE"])
 
-    if st.button("🚀 Générer MàJ"):
-        required = [codes_file, compte_file, map_file, entreprise, statut, col_idx_codes, col_idx_comptes, col_idx_old, col_idx_new]
-        if not all(required):
-            st.warning("Veuillez remplir tous les champs et joindre les trois fichiers.")
-            st.stop()
-
-        try:
-            df_codes   = read_any(codes_file)
-            df_comptes = read_any(compte_file)
-            df_map     = read_any(map_file)
-        except Exception as e:
-            st.error(f"Erreur lecture : {e}")
-            st.stop()
-
-        # ----- extraction codes & comptes -----
-        try:
-            raw_codes = df_codes.iloc[:, col_idx_codes-1].dropna().astype(str).str.strip()
-            comptes   = df_comptes.iloc[:, col_idx_comptes-1].dropna().astype(str).str.strip()
-        except IndexError:
-            st.error("Indice colonne hors plage.")
-            st.stop()
-
-        sanitized = raw_codes.apply(sanitize_code)
-        if sanitized.isna().any():
-            st.error("Codes M2 invalides détectés.")
-            st.dataframe(raw_codes[sanitized.isna()].to_frame("Code fourni"))
-            st.stop()
-
-        # ----- mapping -----
-        try:
-            old_codes = df_map.iloc[:, col_idx_old-1].astype(str).apply(sanitize_code)
-            new_codes = df_map.iloc[:, col_idx_new-1].astype(str).apply(sanitize_code)
-        except IndexError:
-            st.error("Indice colonne mapping hors plage.")
-            st.stop()
-
-        map_df = pd.DataFrame({"old": old_codes, "new": new_codes}).dropna()
-        mapping = map_df.drop_duplicates("old").set_index("old")["new"].to_dict()
-
-        updated_codes = sanitized.map(lambda c: mapping.get(c, c))
-        changed_mask  = updated_codes != sanitized
-        not_found     = (~sanitized.isin(mapping.keys()))
-
-        st.success("Mise à jour terminée :")
-        st.write(f"• {changed_mask.sum()} code(s) remplacé(s)")
-        st.write(f"• {not_found.sum()} code(s) sans correspondance → conservés")
-
-        if changed_mask.any():
-            st.expander("Voir détails").dataframe(pd.DataFrame({"Ancien": sanitized[changed_mask].values, "Nouveau": updated_codes[changed_mask].values}))
-
-        # ----- génération fichiers -----
-        dstr = today_yyMMdd()
-        df1 = pd.DataFrame({
-            0: [f"PC_PROFILE_{entreprise}"] * len(updated_codes),
-            1: [statut] * len(updated_codes),
-            2: [None] * len(updated_codes),
-            3: [f"M2_{c}" for c in updated_codes],
-            4: ["frxProductCatallog:Online"] * len(updated_codes),
-        }).drop_duplicates()
-
-        st.download_button("📥 DFRXHYBRPCP{dstr}0000", df1.to_csv(sep=";", index=False, header=False), file_name=f"DFRXHYBRPCP{dstr}0000", mime="text/plain")
-
-        ack_cmp = f"DFRXHYBRCMP{dstr}000068240530ITDFRXHYBRCMP{dstr}CCMGHYBFRX                    OK000000"
-        st.download_button("📥 ACK CMP", ack_cmp, file_name=f"AFRXHYBRCMP{dstr}0000", mime="text/plain")
-
-        cmp_content = f"PC_{entreprise};PC_{entreprise};PC_PROFILE_{entreprise};{','.join(comptes)};frxProductCatalog:Online"
-        st.download_button("📥 DFRXHYBRCMP{dstr}0000", cmp_content, file_name=f"DFRXHYBRCMP{dstr}0000", mime="text/plain")
-
-        ack_pcp = f"DFRXHYBRPCP{dstr}000068200117ITDFRXHYBRPCP{dstr}RCMRHYBFRX                    OK000000"
-        st.download_button("📥 ACK PCP", ack_pcp, file_name=f"AFRXHYBRPCP{dstr}0000", mime="text/plain")
+    _generate_maj(codes_file, compte_file, map_file, col_idx_codes, col_idx_comptes, col_idx_old, col_idx_new, entreprise, statut)